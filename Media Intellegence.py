@@ -1,16 +1,37 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import io
+import hashlib
+import time
+import threading
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
+# Optional: xxhash hashes uploaded files faster than hashlib's blake2b.
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Optional: orjson parses and serializes JSON faster than the standard json module.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# st.fragment replaced st.experimental_fragment in newer Streamlit releases; use whichever is available.
+fragment = getattr(st, 'fragment', None) or st.experimental_fragment
+
 # --- Configuration ---
 # Set page config for a wider layout and title
 st.set_page_config(layout="wide", page_title="Interactive Media Intelligence Dashboard")
@@ -24,19 +45,112 @@ CHART_COLORS = {
     'media_type': ['#8B5CF6', '#EC4899', '#F97316', '#14B8A6', '#60A5FA', '#DC2626', '#EAB308'], # Various vibrant colors
 }
 
+# Layout shared by all charts (font, centered title and margins), applied once to every figure in get_chart_figure
+CHART_LAYOUT = go.Layout(font_family="Montserrat", title_x=0.5, margin=dict(l=20, r=20, t=50, b=20))
+
+# Plotly config shared by all charts: resize with the container and hide the Plotly logo in the mode bar
+CHART_CONFIG = {'displaylogo': False, 'responsive': True}
+
+# Number of parsed uploads kept in the cache shared by all sessions, and how long (in seconds) each is kept
+PARSED_CSV_CACHE_MAX_ENTRIES = 8
+PARSED_CSV_CACHE_TTL = 3600
+
+# Bounds of the caches derived from the filtered data (also shared by all sessions): entries kept per cache
+# (one per filter selection, or per chart and filter selection for the per-chart caches), and how long (in seconds) each is kept
+FILTER_CACHE_MAX_ENTRIES = 32
+CHART_CACHE_MAX_ENTRIES = 5 * FILTER_CACHE_MAX_ENTRIES # Five charts per filter selection
+FILTER_CACHE_TTL = 3600
+
+# How long (in seconds) an OpenRouter response is reused for an identical request
+OPENROUTER_CACHE_TTL = 3600
+
+# Minimum time (in seconds) between two repaints of the streamed OpenRouter response
+OPENROUTER_STREAM_RENDER_INTERVAL = 0.1
+
+# Number of points above which line charts are drawn with WebGL instead of SVG
+WEBGL_POINT_THRESHOLD = 1000
+
+# Categorical columns that get missing values filled with 'Unknown' during cleaning
+CAT_COLS = ['platform', 'sentiment', 'location', 'media_type', 'influencer_brand', 'post_type']
+# Minimum number of (filtered) records needed to generate insights and the built-in analysis
+MIN_INSIGHT_ROWS = 5
+
+# Low-signal columns left out of the data sample sent to OpenRouter AI (fewer prompt tokens)
+AI_PROMPT_EXCLUDED_COLS = ['influencer_brand']
+
+# Categorical columns offered as filters in the Data Filters section
+FILTER_COLS = ['platform', 'sentiment', 'location', 'media_type']
+
+# PDF report styles, created once and shared by every report
+PDF_STYLES = getSampleStyleSheet()
+
+# Custom style for title
+PDF_TITLE_STYLE = ParagraphStyle(
+    name='TitleStyle',
+    fontName='Helvetica-Bold',
+    fontSize=24,
+    leading=28,
+    alignment=TA_CENTER,
+    spaceAfter=20,
+)
+
+# Custom style for section headers
+PDF_HEADING_STYLE = ParagraphStyle(
+    name='HeadingStyle',
+    fontName='Helvetica-Bold',
+    fontSize=16,
+    leading=18,
+    alignment=TA_LEFT,
+    spaceAfter=10,
+    spaceBefore=20,
+)
+
+# Custom style for body text
+PDF_BODY_STYLE = ParagraphStyle(
+    name='BodyStyle',
+    fontName='Helvetica',
+    fontSize=12,
+    leading=14,
+    alignment=TA_LEFT,
+    spaceAfter=5,
+)
+
 # --- Utility Functions ---
 
-def parse_csv_and_clean_data(uploaded_file):
+def file_digest(file_bytes):
+    """Returns a content hash of the uploaded file bytes, used to detect new uploads and as cache key."""
+    if xxhash is not None:
+        return xxhash.xxh3_64(file_bytes).hexdigest()
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+def loads_json(text):
+    """Parses JSON text, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(text) # orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+    return json.loads(text)
+
+def dumps_json_compact(obj):
+    """Serializes an object to compact JSON text, using orjson when available. Non-JSON values (e.g. Timestamps) become strings."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), default=str)
+
+@st.cache_data(show_spinner=False, max_entries=PARSED_CSV_CACHE_MAX_ENTRIES, ttl=PARSED_CSV_CACHE_TTL)
+def parse_csv_and_clean_data(digest, _file_bytes):
     """
-    Parses an uploaded CSV file into a DataFrame and cleans the data.
+    Parses the bytes of an uploaded CSV file into a DataFrame and cleans the data.
     - Converts 'Date' to datetime.
     - Fills missing 'Engagements' with 0.
     - Normalizes column names (basic).
     - Fills missing categorical data with 'Unknown'.
+    - Sorts the records by date.
+    Returns a tuple of (number of raw records, cleaned DataFrame).
     """
+    raw_count = 0
     try:
-        # Read CSV with pandas
-        df = pd.read_csv(uploaded_file)
+        # Read CSV (only once, the raw row count is taken from the same read)
+        df = pd.read_csv(io.BytesIO(_file_bytes))
+        raw_count = len(df)
 
         # Normalize column names by stripping whitespace and converting to Title Case for display,
         # but using a consistent lowercase_underscore for internal processing.
@@ -49,116 +163,311 @@ def parse_csv_and_clean_data(uploaded_file):
         for col in required_columns:
             if col not in df.columns:
                 st.error(f"Missing required column after cleaning: '{col}'. Please check your CSV file headers.")
-                return pd.DataFrame() # Return empty DataFrame on critical error
+                return raw_count, pd.DataFrame() # Return empty DataFrame on critical error
 
         # Convert 'date' to datetime, coercing errors to NaT (Not a Time)
         df['date'] = pd.to_datetime(df['date'], errors='coerce')
 
-        # Fill missing 'engagements' with 0 and convert to integer
-        df['engagements'] = pd.to_numeric(df['engagements'], errors='coerce').fillna(0).astype(int)
+        # Fill missing 'engagements' with 0 and convert to integer.
+        # int32 halves the column's memory (sums are still computed as int64), int64 is kept only for counts that do not fit.
+        engagements = pd.to_numeric(df['engagements'], errors='coerce').fillna(0).astype('int64')
+        if engagements.between(-2**31, 2**31 - 1).all():
+            engagements = engagements.astype('int32')
+        df['engagements'] = engagements
 
-        # Fill missing categorical data with 'Unknown'
-        for col in ['platform', 'sentiment', 'location', 'media_type', 'influencer_brand', 'post_type']:
-            if col in df.columns:
-                df[col] = df[col].fillna('Unknown').astype(str)
+        # Fill missing categorical data with 'Unknown' (in a single assignment to avoid fragmenting the frame)
+        present_cat_cols = [col for col in CAT_COLS if col in df.columns]
+        df[present_cat_cols] = df[present_cat_cols].fillna('Unknown').astype('string')
 
         # Filter out rows where 'date' could not be parsed
         df.dropna(subset=['date'], inplace=True)
 
-        return df
+        # Store the categorical columns as 'category' dtype (integer codes make filtering and grouping cheaper)
+        df[present_cat_cols] = df[present_cat_cols].astype('category')
+
+        # Sort by date once, so the date range filter can binary search the date column instead of comparing every row
+        df.sort_values('date', inplace=True, kind='stable')
+        df.reset_index(drop=True, inplace=True)
+
+        return raw_count, df
     except Exception as e:
         st.error(f"Error processing CSV: {e}")
-        return pd.DataFrame() # Return empty DataFrame on error
+        return raw_count, pd.DataFrame() # Return empty DataFrame on error
+
+@st.cache_data(show_spinner=False, max_entries=FILTER_CACHE_MAX_ENTRIES, ttl=FILTER_CACHE_TTL)
+def apply_filters(digest, _data, start_date, end_date, platform, sentiment, location, media_type):
+    """Returns the date-sorted data matching the date range and the selected filter values ('All' disables a filter)."""
+    selected_filters = {
+        'platform': platform,
+        'sentiment': sentiment,
+        'location': location,
+        'media_type': media_type,
+    }
+
+    # The data is sorted by date, so the date range is a contiguous slice found by binary search.
+    # No copy needed: the data is only read here, and st.cache_data hands callers their own copy of the result.
+    dates = _data['date'].values
+    start = dates.searchsorted(start_date.to_datetime64(), side='left') if start_date else 0
+    end = dates.searchsorted(end_date.to_datetime64(), side='right') if end_date else len(dates)
+    filtered_df = _data.iloc[start:end]
+
+    # Combine the remaining conditions into one boolean mask over the slice, then index it once
+    mask = np.ones(len(filtered_df), dtype=bool)
+    for col, selected_value in selected_filters.items():
+        if selected_value != 'All':
+            mask &= filtered_df[col].values == selected_value
+
+    # Positional indexing with the numpy mask skips label alignment, and nothing is indexed when no row was filtered out
+    if mask.all():
+        return filtered_df
+    return filtered_df.iloc[mask]
+
+@st.cache_data(show_spinner=False, max_entries=FILTER_CACHE_MAX_ENTRIES, ttl=FILTER_CACHE_TTL)
+def compute_aggregates(filtered_data_key, _data):
+    """Computes the aggregates plotted by the charts and read by the chart insights and the built-in analysis."""
+    # Drop categories absent from the data
+    sentiment_counts = _data['sentiment'].value_counts().loc[lambda counts: counts > 0]
+    media_type_counts = _data['media_type'].value_counts().loc[lambda counts: counts > 0]
+    return {
+        'sentiment_counts': sentiment_counts,
+        'sentiment_pct': sentiment_counts / sentiment_counts.sum() * 100,
+        'media_type_counts': media_type_counts,
+        'media_type_pct': media_type_counts / media_type_counts.sum() * 100,
+        # Group on the day (dt.floor keeps a datetime64 key instead of Python date objects)
+        'engagements_by_date': _data.groupby(_data['date'].dt.floor('D'), sort=True)['engagements'].sum(),
+        # Highest first, as plotted (the stable sort keeps tied platforms in category order)
+        'eng_by_platform': _data.groupby('platform', observed=True)['engagements'].sum().sort_values(ascending=False, kind='stable'),
+        'top_locations': _data.groupby('location', observed=True)['engagements'].sum().nlargest(5),
+        'total_engagements': int(_data['engagements'].sum()),
+        'n': len(_data),
+    }
+
+@st.cache_data(show_spinner=False, max_entries=PARSED_CSV_CACHE_MAX_ENTRIES, ttl=PARSED_CSV_CACHE_TTL)
+def get_filter_options(digest, _data):
+    """Returns the selectbox options ('All' plus the sorted values) of each filter column, and the (min, max) date bounds under 'date'."""
+    # Categories are already sorted and only contain observed values
+    options = {col: ['All'] + _data[col].cat.categories.tolist() for col in FILTER_COLS}
+    options['date'] = (_data['date'].min(), _data['date'].max())
+    return options
+
+def _sentiment_figure(sentiment_counts):
+    """Figure for the Sentiment Breakdown chart, drawn directly from the sentiment value counts."""
+    fig = px.pie(
+        values=sentiment_counts.to_numpy(),
+        names=sentiment_counts.index,
+        title='Sentiment Breakdown',
+        hole=0.4,
+        color=sentiment_counts.index,
+        color_discrete_map={
+            'Positive': CHART_COLORS['sentiment'][0],
+            'Neutral': CHART_COLORS['sentiment'][1],
+            'Negative': CHART_COLORS['sentiment'][2]
+        }
+    )
+    fig.update_traces(
+        textinfo='percent+label', marker=dict(line=dict(color='#000', width=1)),
+        hovertemplate='Sentiment=%{label}<br>Count=%{value}<extra></extra>'
+    )
+    return fig
+
+def _bar_figure(engagements, x_title, title, color):
+    """
+    Bar chart of total engagements per category, built with graph_objects from the Series' numpy arrays
+    (plotly.express would first validate and reshape a DataFrame for these small 1D series).
+    """
+    fig = go.Figure(go.Bar(
+        x=engagements.index.to_numpy(),
+        y=engagements.to_numpy(),
+        marker_color=color,
+        hovertemplate=f"{x_title}=%{{x}}<br>Total Engagements=%{{y}}<extra></extra>"
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title='Total Engagements')
+    return fig
+
+def _trend_figure(engagements_by_date):
+    """Figure for the Engagement Trend over time chart, built with graph_objects from the Series' numpy arrays."""
+    # Dense series are drawn with WebGL, which does not support spline lines, smaller ones keep the SVG spline
+    use_webgl = len(engagements_by_date) > WEBGL_POINT_THRESHOLD
+    trace_type = go.Scattergl if use_webgl else go.Scatter
+    fig = go.Figure(trace_type(
+        x=engagements_by_date.index.to_numpy(),
+        y=engagements_by_date.to_numpy(),
+        mode='lines+markers',
+        line=dict(color=CHART_COLORS['primary'], shape='linear' if use_webgl else 'spline'),
+        hovertemplate="Date=%{x}<br>Total Engagements=%{y}<extra></extra>"
+    ))
+    fig.update_layout(title='Engagement Trend over time', xaxis_title='Date', yaxis_title='Total Engagements')
+    return fig
+
+def _platform_figure(platform_engagements):
+    """Figure for the Platform Engagements chart."""
+    return _bar_figure(platform_engagements, 'Platform', 'Platform Engagements', CHART_COLORS['secondary'])
+
+def _media_type_figure(media_type_counts):
+    """Figure for the Media Type Mix chart, drawn directly from the media type value counts."""
+    fig = px.pie(
+        values=media_type_counts.to_numpy(),
+        names=media_type_counts.index,
+        title='Media Type Mix',
+        hole=0.4,
+        color=media_type_counts.index,
+        color_discrete_sequence=CHART_COLORS['media_type']
+    )
+    fig.update_traces(
+        textinfo='percent+label', marker=dict(line=dict(color='#000', width=1)),
+        hovertemplate='Media Type=%{label}<br>Count=%{value}<extra></extra>'
+    )
+    return fig
+
+def _location_figure(location_engagements):
+    """Figure for the Top 5 Locations chart."""
+    return _bar_figure(location_engagements, 'Location', 'Top 5 Locations by Engagement', CHART_COLORS['tertiary'])
+
+# Figure builder for each chart, each takes the chart's data (from compute_aggregates) and returns a Plotly figure
+FIGURE_BUILDERS = {
+    'Sentiment Breakdown': _sentiment_figure,
+    'Engagement Trend over time': _trend_figure,
+    'Platform Engagements': _platform_figure,
+    'Media Type Mix': _media_type_figure,
+    'Top 5 Locations': _location_figure,
+}
+
+@st.cache_data(show_spinner=False, max_entries=CHART_CACHE_MAX_ENTRIES, ttl=FILTER_CACHE_TTL)
+def get_chart_figure(chart_type, filtered_data_key, _chart_data):
+    """Builds the Plotly figure for a given chart type from its aggregated data."""
+    fig = FIGURE_BUILDERS[chart_type](_chart_data)
+    fig.update_layout(CHART_LAYOUT)
+    return fig
+
+def _sentiment_insights(aggregates):
+    """Insights for the Sentiment Breakdown chart."""
+    insights = []
+    sentiment_counts = aggregates['sentiment_pct']
+    if not sentiment_counts.empty:
+        insights.append(f"The most dominant sentiment is '{sentiment_counts.index[0]}' with {sentiment_counts.iloc[0]:.2f}% of posts.")
+    if len(sentiment_counts) > 1:
+        insights.append(f"The second most common sentiment is '{sentiment_counts.index[1]}' representing {sentiment_counts.iloc[1]:.2f}% of posts.")
+    if len(sentiment_counts) > 2:
+        insights.append(f"The least common sentiment among the top three is '{sentiment_counts.index[-1]}' with {sentiment_counts.iloc[-1]:.2f}%.")
+    elif len(sentiment_counts) == 2:
+        insights.append(f"The second sentiment, '{sentiment_counts.index[1]}', is notably less frequent than the dominant one.")
+    return insights
+
+def _trend_insights(aggregates):
+    """Insights for the Engagement Trend over time chart."""
+    insights = []
+    engagements_by_date = aggregates['engagements_by_date']
+    if not engagements_by_date.empty:
+        peak_date = engagements_by_date.idxmax().strftime('%Y-%m-%d')
+        peak_engagements = engagements_by_date.max()
+        insights.append(f"Peak engagement occurred on {peak_date} with {peak_engagements} total engagements, indicating a significant event or campaign around that time.")
+
+        lowest_date = engagements_by_date.idxmin().strftime('%Y-%m-%d')
+        lowest_engagements = engagements_by_date.min()
+        insights.append(f"Lowest engagement occurred on {lowest_date} with {lowest_engagements} total engagements, potentially due to low activity or off-peak periods.")
+
+        if len(engagements_by_date) >= 2:
+            first_engagement = engagements_by_date.iloc[0]
+            last_engagement = engagements_by_date.iloc[-1]
+            if last_engagement > first_engagement * 1.1:
+                insights.append("Overall, there appears to be an increasing trend in engagements over the analyzed period.")
+            elif last_engagement < first_engagement * 0.9:
+                insights.append("Overall, there appears to be a decreasing trend in engagements over the analyzed period.")
+            else:
+                insights.append("Engagements show a relatively stable trend over time.")
+    else:
+        insights.append("Not enough data points to determine a clear engagement trend.")
+    return insights
 
-def get_insights(chart_type, data):
-    """Generates top 3 insights for a given chart type and data."""
+def _platform_insights(aggregates):
+    """Insights for the Platform Engagements chart."""
+    insights = []
+    engagements_by_platform = aggregates['eng_by_platform'].nlargest(3)
+    if not engagements_by_platform.empty:
+        insights.append(f"The platform '{engagements_by_platform.index[0]}' generates the highest engagement with {engagements_by_platform.iloc[0]} total engagements, making it the most effective channel.")
+    if len(engagements_by_platform) > 1:
+        insights.append(f"'{engagements_by_platform.index[1]}' is the second highest platform, indicating its significant contribution to overall engagement.")
+    if len(engagements_by_platform) > 2:
+        insights.append(f"The top three platforms ('{engagements_by_platform.index[0]}', '{engagements_by_platform.index[1]}', '{engagements_by_platform.index[2]}') collectively capture a large majority of total engagements.")
+    elif not engagements_by_platform.empty:
+        insights.append("Engagement is heavily concentrated on a limited number of platforms.")
+    return insights
+
+def _media_type_insights(aggregates):
+    """Insights for the Media Type Mix chart."""
     insights = []
-    if data.empty:
+    media_type_counts = aggregates['media_type_pct']
+    if not media_type_counts.empty:
+        insights.append(f"'{media_type_counts.index[0]}' is the most frequently used media type, accounting for {media_type_counts.iloc[0]:.2f}% of content.")
+    if len(media_type_counts) > 1:
+        insights.append(f"The second most common media type is '{media_type_counts.index[1]}', suggesting its importance in content strategy.")
+    if len(media_type_counts) > 2:
+        insights.append(f"There's a diverse mix of media types, but the top three ('{media_type_counts.index[0]}', '{media_type_counts.index[1]}', '{media_type_counts.index[2]}') dominate content creation.")
+    elif not media_type_counts.empty:
+        insights.append("The content strategy appears focused on a few primary media types.")
+    return insights
+
+def _location_insights(aggregates):
+    """Insights for the Top 5 Locations chart."""
+    insights = []
+    engagements_by_location = aggregates['top_locations']
+    if not engagements_by_location.empty:
+        insights.append(f"The top location by engagement is '{engagements_by_location.index[0]}' with {engagements_by_location.iloc[0]} total engagements, highlighting a key geographic market.")
+    if len(engagements_by_location) > 1:
+        insights.append(f"'{engagements_by_location.index[1]}' is the second most engaging location, indicating strong audience presence there.")
+    if len(engagements_by_location) > 2:
+        insights.append(f"The top locations show concentrated engagement, suggesting specific regional marketing efforts could be highly effective.")
+    elif not engagements_by_location.empty:
+        insights.append("Engagement is highly concentrated in a very small number of locations.")
+    return insights
+
+# Insight builder for each chart, each takes the precomputed aggregates and returns a list of insights
+INSIGHT_BUILDERS = {
+    'Sentiment Breakdown': _sentiment_insights,
+    'Engagement Trend over time': _trend_insights,
+    'Platform Engagements': _platform_insights,
+    'Media Type Mix': _media_type_insights,
+    'Top 5 Locations': _location_insights,
+}
+
+def insights_card_html(insights):
+    """Builds the HTML of an insights card, so the whole card is sent to the page in a single st.markdown call."""
+    insight_paragraphs = "".join(f"<p class='text-gray-600'>{insight}</p>" for insight in insights)
+    return (
+        "<div class='mt-4 p-4 bg-gray-50 rounded-md border border-gray-200'>"
+        "<h4 class='text-lg font-medium text-gray-700 mb-2'>Top 3 Insights:</h4>"
+        f"{insight_paragraphs}</div>"
+    )
+
+@st.cache_data(show_spinner=False, max_entries=CHART_CACHE_MAX_ENTRIES, ttl=FILTER_CACHE_TTL)
+def get_insights(chart_type, filtered_data_key, _aggregates):
+    """Generates top 3 insights for a given chart type from the precomputed aggregates."""
+    if _aggregates['n'] == 0:
         return ["No data available to generate insights for this chart."]
+    if _aggregates['n'] < MIN_INSIGHT_ROWS:
+        return ["Not enough data after filtering to produce reliable insights."]
 
-    if chart_type == 'Sentiment Breakdown':
-        sentiment_counts = data['sentiment'].value_counts(normalize=True) * 100
-        if not sentiment_counts.empty:
-            insights.append(f"The most dominant sentiment is '{sentiment_counts.index[0]}' with {sentiment_counts.iloc[0]:.2f}% of posts.")
-        if len(sentiment_counts) > 1:
-            insights.append(f"The second most common sentiment is '{sentiment_counts.index[1]}' representing {sentiment_counts.iloc[1]:.2f}% of posts.")
-        if len(sentiment_counts) > 2:
-            insights.append(f"The least common sentiment among the top three is '{sentiment_counts.index[-1]}' with {sentiment_counts.iloc[-1]:.2f}%.")
-        elif len(sentiment_counts) == 2:
-            insights.append(f"The second sentiment, '{sentiment_counts.index[1]}', is notably less frequent than the dominant one.")
-
-    elif chart_type == 'Engagement Trend over time':
-        engagements_by_date = data.groupby(data['date'].dt.date)['engagements'].sum().sort_index()
-        if not engagements_by_date.empty:
-            peak_date = engagements_by_date.idxmax()
-            peak_engagements = engagements_by_date.max()
-            insights.append(f"Peak engagement occurred on {peak_date} with {peak_engagements} total engagements, indicating a significant event or campaign around that time.")
-
-            lowest_date = engagements_by_date.idxmin()
-            lowest_engagements = engagements_by_date.min()
-            insights.append(f"Lowest engagement occurred on {lowest_date} with {lowest_engagements} total engagements, potentially due to low activity or off-peak periods.")
-
-            if len(engagements_by_date) >= 2:
-                first_engagement = engagements_by_date.iloc[0]
-                last_engagement = engagements_by_date.iloc[-1]
-                if last_engagement > first_engagement * 1.1:
-                    insights.append("Overall, there appears to be an increasing trend in engagements over the analyzed period.")
-                elif last_engagement < first_engagement * 0.9:
-                    insights.append("Overall, there appears to be a decreasing trend in engagements over the analyzed period.")
-                else:
-                    insights.append("Engagements show a relatively stable trend over time.")
-        else:
-            insights.append("Not enough data points to determine a clear engagement trend.")
-
-    elif chart_type == 'Platform Engagements':
-        engagements_by_platform = data.groupby('platform')['engagements'].sum().nlargest(3)
-        if not engagements_by_platform.empty:
-            insights.append(f"The platform '{engagements_by_platform.index[0]}' generates the highest engagement with {engagements_by_platform.iloc[0]} total engagements, making it the most effective channel.")
-        if len(engagements_by_platform) > 1:
-            insights.append(f"'{engagements_by_platform.index[1]}' is the second highest platform, indicating its significant contribution to overall engagement.")
-        if len(engagements_by_platform) > 2:
-            insights.append(f"The top three platforms ('{engagements_by_platform.index[0]}', '{engagements_by_platform.index[1]}', '{engagements_by_platform.index[2]}') collectively capture a large majority of total engagements.")
-        elif not engagements_by_platform.empty:
-            insights.append("Engagement is heavily concentrated on a limited number of platforms.")
-
-    elif chart_type == 'Media Type Mix':
-        media_type_counts = data['media_type'].value_counts(normalize=True) * 100
-        if not media_type_counts.empty:
-            insights.append(f"'{media_type_counts.index[0]}' is the most frequently used media type, accounting for {media_type_counts.iloc[0]:.2f}% of content.")
-        if len(media_type_counts) > 1:
-            insights.append(f"The second most common media type is '{media_type_counts.index[1]}', suggesting its importance in content strategy.")
-        if len(media_type_counts) > 2:
-            insights.append(f"There's a diverse mix of media types, but the top three ('{media_type_counts.index[0]}', '{media_type_counts.index[1]}', '{media_type_counts.index[2]}') dominate content creation.")
-        elif not media_type_counts.empty:
-            insights.append("The content strategy appears focused on a few primary media types.")
-
-    elif chart_type == 'Top 5 Locations':
-        engagements_by_location = data.groupby('location')['engagements'].sum().nlargest(5)
-        if not engagements_by_location.empty:
-            insights.append(f"The top location by engagement is '{engagements_by_location.index[0]}' with {engagements_by_location.iloc[0]} total engagements, highlighting a key geographic market.")
-        if len(engagements_by_location) > 1:
-            insights.append(f"'{engagements_by_location.index[1]}' is the second most engaging location, indicating strong audience presence there.")
-        if len(engagements_by_location) > 2:
-            insights.append(f"The top locations show concentrated engagement, suggesting specific regional marketing efforts could be highly effective.")
-        elif not engagements_by_location.empty:
-            insights.append("Engagement is highly concentrated in a very small number of locations.")
-    
+    builder = INSIGHT_BUILDERS.get(chart_type)
+    insights = builder(_aggregates) if builder else []
     return insights if insights else ["No specific insights available for this chart type."]
 
 
-def generate_our_model_analysis(data):
-    """Generates summary and recommendations based on built-in logic."""
-    if data.empty:
+@st.cache_data(show_spinner=False, max_entries=FILTER_CACHE_MAX_ENTRIES, ttl=FILTER_CACHE_TTL)
+def generate_our_model_analysis(filtered_data_key, _aggregates):
+    """Generates summary and recommendations based on built-in logic, from the precomputed aggregates."""
+    if _aggregates['n'] == 0:
         return "No data available to generate a summary.", []
+    if _aggregates['n'] < MIN_INSIGHT_ROWS:
+        return "Not enough data after filtering to produce a reliable summary.", []
 
     summary_parts = []
     recommendations = []
 
-    total_engagements = data['engagements'].sum()
-    summary_parts.append(f"Analyzed a total of {len(data)} posts with {total_engagements} engagements.")
+    total_engagements = _aggregates['total_engagements']
+    summary_parts.append(f"Analyzed a total of {_aggregates['n']} posts with {total_engagements} engagements.")
 
     # Sentiment
-    sentiment_counts = data['sentiment'].value_counts(normalize=True) * 100
+    sentiment_counts = _aggregates['sentiment_pct']
     if not sentiment_counts.empty:
         dominant_sentiment = sentiment_counts.index[0]
         summary_parts.append(f"The dominant sentiment is '{dominant_sentiment}' ({sentiment_counts.iloc[0]:.1f}%).")
@@ -169,8 +478,8 @@ def generate_our_model_analysis(data):
         elif dominant_sentiment == 'Neutral' and sentiment_counts.iloc[0] > 50:
             recommendations.append("Boost engagement for neutral content: Experiment with more emotive language, compelling visuals, and clear calls to action to shift neutral sentiment towards positive.")
 
-    # Top Platform
-    engagements_by_platform = data.groupby('platform')['engagements'].sum().sort_values(ascending=False)
+    # Top Platform (only the top two are needed, so avoid sorting the whole aggregate)
+    engagements_by_platform = _aggregates['eng_by_platform'].nlargest(2)
     if not engagements_by_platform.empty:
         top_platform = engagements_by_platform.index[0]
         summary_parts.append(f"'{top_platform}' is the highest engaging platform, contributing {engagements_by_platform.iloc[0]} engagements.")
@@ -179,7 +488,7 @@ def generate_our_model_analysis(data):
             recommendations.append(f"Explore underperforming platforms: Investigate why platforms like '{engagements_by_platform.index[1]}' have significantly lower engagement compared to the top performer. Could there be an audience mismatch or content style issue?")
 
     # Top Media Type
-    media_type_counts = data['media_type'].value_counts().sort_values(ascending=False)
+    media_type_counts = _aggregates['media_type_counts'].nlargest(2)
     if not media_type_counts.empty:
         top_media_type = media_type_counts.index[0]
         summary_parts.append(f"'{top_media_type}' is the most frequently used media type.")
@@ -188,7 +497,7 @@ def generate_our_model_analysis(data):
             recommendations.append("Diversify media types: If your content is heavily skewed towards one media type, consider experimenting with other formats to reach different audience segments or cater to varied consumption preferences.")
 
     # Engagement Trend
-    engagements_by_date = data.groupby(data['date'].dt.date)['engagements'].sum().sort_index()
+    engagements_by_date = _aggregates['engagements_by_date']
     if len(engagements_by_date) >= 2:
         first_engagement = engagements_by_date.iloc[0]
         last_engagement = engagements_by_date.iloc[-1]
@@ -209,38 +518,74 @@ def generate_our_model_analysis(data):
 
     return summary_text, recommendations
 
-def generate_openrouter_analysis(data_sample, api_key, model_name):
+@st.cache_resource
+def get_openrouter_response_cache():
+    """
+    Returns the process-wide cache of OpenRouter responses, shared by all sessions, with the lock guarding it:
+    (lock, {(model, prompt hash, API key hash): (timestamp, response content)}).
+    A plain dict is used because st.cache_data cannot wrap the streamed call
+    (it renders into a placeholder created outside the function).
+    """
+    return threading.Lock(), {}
+
+@st.cache_resource
+def get_openrouter_session():
+    """
+    Returns a shared requests.Session for OpenRouter AI, so the TCP/TLS connection is kept alive across calls.
+    Static headers are set once, and rate-limited or unavailable responses are retried with backoff.
+    """
+    session = requests.Session()
+    retries = Retry(
+        total=2,
+        read=0, # Never resend the (non-idempotent, billed) completion request after a read error or timeout
+        other=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=['POST'],
+        raise_on_status=False, # Return the last response so its error details can be reported
+    )
+    session.mount("https://", HTTPAdapter(max_retries=retries))
+    session.headers.update({
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://media-intelligence-dashboard.streamlit.app", # Replace with your actual app URL if deployed
+        "X-Title": "Interactive Media Intelligence Dashboard"
+    })
+    return session
+
+def generate_openrouter_analysis(data_sample, api_key, model_name, stream_placeholder=None):
     """
     Generates summary and recommendations using OpenRouter AI.
+    The response is streamed; if a placeholder (e.g. st.empty()) is given,
+    the content received so far is rendered into it as it arrives.
     """
     if not api_key:
         return "", [], "Please enter your OpenRouter API Key."
     if data_sample.empty:
         return "", [], "No data available to send to AI for analysis."
 
-    # Convert DataFrame sample to a list of dictionaries for JSON serialization
-    data_list = data_sample.to_dict(orient='records')
+    # Limit data to 50 rows for brevity and API limits (before converting, so only those rows are materialized)
+    # and leave out low-signal columns, then convert to a list of dictionaries for JSON serialization
+    data_sample = data_sample.head(50).drop(columns=AI_PROMPT_EXCLUDED_COLS, errors='ignore')
+    limited_data = data_sample.to_dict(orient='records')
 
-    # Limit data to 50 rows for brevity and API limits
-    limited_data = data_list[:50]
+    # Compact JSON Lines (one object per row, no indentation) to keep the prompt token count low
+    compact_data = "\n".join(dumps_json_compact(row) for row in limited_data)
 
     prompt = f"""
     You are an expert media intelligence analyst.
     I will provide you with cleaned social media data. Each entry represents a post with the following details:
-    {json.dumps(list(data_sample.columns), indent=2)}
+    {dumps_json_compact(list(data_sample.columns))}
 
     Analyze the following data and provide a concise overall summary of the media performance and specific campaign recommendations to optimize future strategies.
     Your response MUST be in JSON format, with two keys: "summary" (a string) and "recommendations" (an array of strings).
 
-    Here is a sample of the data (first {len(limited_data)} rows):
-    {json.dumps(limited_data, indent=2)}
+    Here is a sample of the data (first {len(limited_data)} rows, one JSON object per line):
+    {compact_data}
     """
 
+    # Only the Authorization header is per call, the static headers are set on the shared session
     headers = {
         "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://media-intelligence-dashboard.streamlit.app", # Replace with your actual app URL if deployed
-        "X-Title": "Interactive Media Intelligence Dashboard"
     }
 
     payload = {
@@ -248,17 +593,67 @@ def generate_openrouter_analysis(data_sample, api_key, model_name):
         "messages": [
             {"role": "user", "content": prompt}
         ],
-        "response_format": {"type": "json_object"}
+        "response_format": {"type": "json_object"},
+        "stream": True
     }
 
+    # Identical requests (same model, prompt and API key) reuse a recent response instead of calling the API again.
+    # Only hashes are kept in the key, never the raw API key or data.
+    cache_lock, response_cache = get_openrouter_response_cache()
+    cache_key = (
+        model_name,
+        hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+        hashlib.sha256(api_key.encode('utf-8')).hexdigest(),
+    )
+
+    ai_content = ""
     try:
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload, timeout=60)
+        with cache_lock:
+            cached_response = response_cache.get(cache_key)
+        if cached_response is not None and time.time() - cached_response[0] < OPENROUTER_CACHE_TTL:
+            parsed_content = loads_json(cached_response[1])
+            summary = parsed_content.get('summary', 'AI did not provide a summary.')
+            recommendations = parsed_content.get('recommendations', ['AI did not provide recommendations.'])
+            return summary, recommendations, None # No error
+
+        # (connect, read) timeouts: the read timeout applies between streamed chunks
+        response = get_openrouter_session().post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload, stream=True, timeout=(5, 120))
         response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-        result = response.json()
+        response.encoding = 'utf-8' # Event streams are UTF-8, but carry no charset in their content type
+
+        # Read the Server-Sent Events: 'data: {...}' lines carry the chunks, other lines are comments/keep-alives.
+        # The placeholder is repainted at most every OPENROUTER_STREAM_RENDER_INTERVAL seconds, since each repaint resends the whole content.
+        last_render = 0.0
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data: '):
+                continue
+            event_data = line[len('data: '):]
+            if event_data == '[DONE]':
+                break
+            chunk = loads_json(event_data)
+            if 'error' in chunk:
+                return "", [], f"OpenRouter AI returned an error: {chunk['error'].get('message', chunk['error'])}"
+            choices = chunk.get('choices') or [{}]
+            delta = choices[0].get('delta', {}).get('content')
+            if delta:
+                ai_content += delta
+                if stream_placeholder is not None and time.monotonic() - last_render >= OPENROUTER_STREAM_RENDER_INTERVAL:
+                    stream_placeholder.code(ai_content, language='json')
+                    last_render = time.monotonic()
+        if stream_placeholder is not None and ai_content:
+            stream_placeholder.code(ai_content, language='json') # Final render with the complete content
+
+        parsed_content = loads_json(ai_content or '{}')
+
+        # Only responses that parsed into a JSON object are cached, expired entries are dropped on the way.
+        # The lock keeps other sessions from writing to the shared dict while it is scanned.
+        if isinstance(parsed_content, dict):
+            now = time.time()
+            with cache_lock:
+                for key in [key for key, (timestamp, _) in response_cache.items() if now - timestamp >= OPENROUTER_CACHE_TTL]:
+                    response_cache.pop(key, None)
+                response_cache[cache_key] = (now, ai_content or '{}')
 
-        ai_content = result.get('choices', [])[0].get('message', {}).get('content', '{}')
-        parsed_content = json.loads(ai_content)
-        
         summary = parsed_content.get('summary', 'AI did not provide a summary.')
         recommendations = parsed_content.get('recommendations', ['AI did not provide recommendations.'])
 
@@ -285,59 +680,28 @@ def create_pdf_report(summary_text, recommendations):
     """Generates a basic text-based PDF report of the summary and recommendations."""
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-
-    # Custom style for title
-    title_style = ParagraphStyle(
-        name='TitleStyle',
-        fontName='Helvetica-Bold',
-        fontSize=24,
-        leading=28,
-        alignment=TA_CENTER,
-        spaceAfter=20,
-    )
 
-    # Custom style for section headers
-    heading_style = ParagraphStyle(
-        name='HeadingStyle',
-        fontName='Helvetica-Bold',
-        fontSize=16,
-        leading=18,
-        alignment=TA_LEFT,
-        spaceAfter=10,
-        spaceBefore=20,
-    )
-
-    # Custom style for body text
-    body_style = ParagraphStyle(
-        name='BodyStyle',
-        fontName='Helvetica',
-        fontSize=12,
-        leading=14,
-        alignment=TA_LEFT,
-        spaceAfter=5,
-    )
-
-    flowables = []
+    if recommendations:
+        recommendation_flowables = [Paragraph(f"{i+1}. {rec}", PDF_BODY_STYLE) for i, rec in enumerate(recommendations)]
+    else:
+        recommendation_flowables = [Paragraph("No specific recommendations were provided.", PDF_BODY_STYLE)]
 
-    flowables.append(Paragraph("Media Intelligence Report", title_style))
-    flowables.append(Paragraph("---", styles['Normal'])) # Separator
-    flowables.append(Spacer(1, 12))
+    flowables = [
+        Paragraph("Media Intelligence Report", PDF_TITLE_STYLE),
+        Paragraph("---", PDF_STYLES['Normal']), # Separator
+        Spacer(1, 12),
 
-    flowables.append(Paragraph("Overall Summary:", heading_style))
-    flowables.append(Paragraph(summary_text, body_style))
-    flowables.append(Spacer(1, 24))
+        Paragraph("Overall Summary:", PDF_HEADING_STYLE),
+        Paragraph(summary_text, PDF_BODY_STYLE),
+        Spacer(1, 24),
 
-    flowables.append(Paragraph("Campaign Recommendations:", heading_style))
-    if recommendations:
-        for i, rec in enumerate(recommendations):
-            flowables.append(Paragraph(f"{i+1}. {rec}", body_style))
-    else:
-        flowables.append(Paragraph("No specific recommendations were provided.", body_style))
-    flowables.append(Spacer(1, 24))
+        Paragraph("Campaign Recommendations:", PDF_HEADING_STYLE),
+        *recommendation_flowables,
+        Spacer(1, 24),
 
-    flowables.append(Paragraph("Powered by Gemini AI", body_style))
-    flowables.append(Paragraph("Copyright Media Intelligence Vokasi UI", body_style))
+        Paragraph("Powered by Gemini AI", PDF_BODY_STYLE),
+        Paragraph("Copyright Media Intelligence Vokasi UI", PDF_BODY_STYLE),
+    ]
 
     try:
         doc.build(flowables)
@@ -347,9 +711,93 @@ def create_pdf_report(summary_text, recommendations):
         st.error(f"Error generating PDF: {e}")
         return None
 
+@st.cache_data(show_spinner=False, max_entries=FILTER_CACHE_MAX_ENTRIES, ttl=FILTER_CACHE_TTL)
+def build_pdf_report(summary_text, recommendations):
+    """Returns the PDF report as bytes (None if it could not be generated)."""
+    buffer = create_pdf_report(summary_text, list(recommendations))
+    return buffer.getvalue() if buffer else None
+
+def reset_filters():
+    """
+    Resets the data and all filter widgets to their defaults, without parsing the CSV again.
+    Used as the Reset Filters button callback, which runs before the widgets of the following rerun are created.
+    """
+    st.session_state.processed_data = st.session_state.original_data
+    st.session_state.filtered_data = st.session_state.original_data
+    # Reset selectbox values, date inputs fall back to their default (full) range once their state is removed
+    st.session_state.platform_select = 'All'
+    st.session_state.sentiment_select = 'All'
+    st.session_state.location_select = 'All'
+    st.session_state.media_type_select = 'All'
+    st.session_state.pop('start_date_filter', None)
+    st.session_state.pop('end_date_filter', None)
+
+def render_charts(filtered_data, filtered_data_key):
+    """Renders the five charts and their insights for the filtered data."""
+    # Aggregates plotted by the charts and shared by the insights of all charts
+    aggregates = compute_aggregates(filtered_data_key, filtered_data)
+
+    # Chart 1: Sentiment Breakdown
+    st.markdown("### Sentiment Breakdown")
+    fig1 = get_chart_figure('Sentiment Breakdown', filtered_data_key, aggregates['sentiment_counts'])
+    st.plotly_chart(fig1, use_container_width=True, config=CHART_CONFIG)
+    st.markdown(insights_card_html(get_insights('Sentiment Breakdown', filtered_data_key, aggregates)), unsafe_allow_html=True)
+
+
+    # Chart 2: Engagement Trend over time
+    st.markdown("### Engagement Trend over time")
+    fig2 = get_chart_figure('Engagement Trend over time', filtered_data_key, aggregates['engagements_by_date'])
+    st.plotly_chart(fig2, use_container_width=True, config=CHART_CONFIG)
+    st.markdown(insights_card_html(get_insights('Engagement Trend over time', filtered_data_key, aggregates)), unsafe_allow_html=True)
+
+
+    # Chart 3: Platform Engagements
+    st.markdown("### Platform Engagements")
+    fig3 = get_chart_figure('Platform Engagements', filtered_data_key, aggregates['eng_by_platform'])
+    st.plotly_chart(fig3, use_container_width=True, config=CHART_CONFIG)
+    st.markdown(insights_card_html(get_insights('Platform Engagements', filtered_data_key, aggregates)), unsafe_allow_html=True)
+
+
+    # Chart 4: Media Type Mix
+    st.markdown("### Media Type Mix")
+    fig4 = get_chart_figure('Media Type Mix', filtered_data_key, aggregates['media_type_counts'])
+    st.plotly_chart(fig4, use_container_width=True, config=CHART_CONFIG)
+    st.markdown(insights_card_html(get_insights('Media Type Mix', filtered_data_key, aggregates)), unsafe_allow_html=True)
+
+
+    # Chart 5: Top 5 Locations
+    st.markdown("### Top 5 Locations by Engagement")
+    fig5 = get_chart_figure('Top 5 Locations', filtered_data_key, aggregates['top_locations'])
+    st.plotly_chart(fig5, use_container_width=True, config=CHART_CONFIG)
+    st.markdown(insights_card_html(get_insights('Top 5 Locations', filtered_data_key, aggregates)), unsafe_allow_html=True)
+
+@fragment
+def render_openrouter_config():
+    """
+    Renders the OpenRouter API key input and model selectbox.
+    Runs as a fragment, so typing the key or changing the model does not rerun the whole script
+    (and the charts above are not rebuilt).
+    """
+    st.session_state.openrouter_api_key = st.text_input(
+        "OpenRouter API Key:",
+        type="password",
+        value=st.session_state.openrouter_api_key,
+        placeholder="sk-or-...",
+        help="Get your key from https://openrouter.ai/keys",
+        key="openrouter_api_key_input"
+    )
+    st.session_state.openrouter_selected_model = st.selectbox(
+        "Select AI Model:",
+        options=openRouterModels,
+        index=openRouterModels.index(st.session_state.openrouter_selected_model) if st.session_state.openrouter_selected_model in openRouterModels else 0,
+        key="openrouter_model_select"
+    )
+
 # --- Streamlit App Layout ---
 
-st.markdown("""
+# Page styles, kept as a constant string. It is still emitted on every rerun because Streamlit
+# removes elements that a rerun does not render again, so injecting it only once would drop the styles.
+APP_CSS = """
     <style>
     @import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@400;500;600;700&display=swap');
     html, body, [class*="st-"] {
@@ -463,13 +911,16 @@ st.markdown("""
         to { transform: rotate(360deg); }
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 st.markdown("<h1 class='main-header'>Interactive Media Intelligence Dashboard</h1>", unsafe_allow_html=True)
 
 # --- State Management (using st.session_state) ---
 if 'original_data' not in st.session_state:
     st.session_state.original_data = pd.DataFrame()
+if 'original_record_count' not in st.session_state:
+    st.session_state.original_record_count = 0
 if 'processed_data' not in st.session_state:
     st.session_state.processed_data = pd.DataFrame()
 if 'filtered_data' not in st.session_state:
@@ -509,14 +960,21 @@ st.markdown("""
 uploaded_file = st.file_uploader("Select CSV File:", type=["csv"], key="csv_uploader")
 
 if uploaded_file is not None:
-    # Check if a new file is uploaded or existing file is re-uploaded
-    if st.session_state.get('last_uploaded_file_id') != uploaded_file.file_id:
+    # Hash each upload once: the uploader's file id stays the same across reruns until another file is uploaded
+    if st.session_state.get('uploaded_file_id') != uploaded_file.file_id:
+        st.session_state.uploaded_file_digest = file_digest(uploaded_file.getvalue())
+        st.session_state.uploaded_file_id = uploaded_file.file_id
+    uploaded_digest = st.session_state.uploaded_file_digest
+
+    # Check if a new file is uploaded, based on its content rather than the uploader's file id
+    if st.session_state.get('last_uploaded_digest') != uploaded_digest:
         with st.spinner("Processing file..."):
-            processed_df = parse_csv_and_clean_data(uploaded_file)
-            st.session_state.original_data = pd.read_csv(uploaded_file) # Store original for count display
+            raw_count, processed_df = parse_csv_and_clean_data(uploaded_digest, uploaded_file.getvalue())
+            st.session_state.original_record_count = raw_count # Store original count for display
+            st.session_state.original_data = processed_df # Kept to reset filters without parsing again
             st.session_state.processed_data = processed_df
             st.session_state.filtered_data = processed_df.copy() # Initialize filtered data
-            st.session_state.last_uploaded_file_id = uploaded_file.file_id
+            st.session_state.last_uploaded_digest = uploaded_digest
             st.session_state.our_model_summary = "" # Clear previous summaries
             st.session_state.our_model_recommendations = []
             st.session_state.ai_generated_summary = ""
@@ -524,7 +982,7 @@ if uploaded_file is not None:
             st.session_state.current_analysis_source = 'our_model' # Reset analysis source to default
 
         if not st.session_state.processed_data.empty:
-            st.success(f"File uploaded and parsed successfully. Records found: {len(st.session_state.original_data)}. Valid records after cleaning: {len(st.session_state.processed_data)}.")
+            st.success(f"File uploaded and parsed successfully. Records found: {st.session_state.original_record_count}. Valid records after cleaning: {len(st.session_state.processed_data)}.")
         else:
             st.error("Error parsing CSV file. Please ensure it is correctly formatted or has valid data.")
 
@@ -546,8 +1004,8 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 if not st.session_state.processed_data.empty:
-    st.markdown(f"<p class='mt-4 text-green-600 font-medium'>Data cleaned. Valid records for charting: {len(st.session_state.processed_data)} (out of {len(st.session_state.original_data)} original records).</p>", unsafe_allow_html=True)
-elif st.session_state.original_data.empty and uploaded_file is not None: # only show if file was attempted
+    st.markdown(f"<p class='mt-4 text-green-600 font-medium'>Data cleaned. Valid records for charting: {len(st.session_state.processed_data)} (out of {st.session_state.original_record_count} original records).</p>", unsafe_allow_html=True)
+elif st.session_state.original_record_count == 0 and uploaded_file is not None: # only show if file was attempted
     st.markdown("<p class='mt-4 text-yellow-600 font-medium'>No valid records found after cleaning. Please ensure your CSV has correctly formatted dates and engagements.</p>", unsafe_allow_html=True)
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -557,34 +1015,51 @@ if not st.session_state.processed_data.empty:
     st.markdown("<div class='content-card'>", unsafe_allow_html=True)
     st.markdown("<h2 class='section-header'>Data Filters</h2>", unsafe_allow_html=True)
 
-    col1, col2, col3, col4 = st.columns(4)
+    # Options for all filter widgets
+    filter_options = get_filter_options(st.session_state.get('last_uploaded_digest'), st.session_state.processed_data)
 
     # Date Range Filter
-    min_date = st.session_state.processed_data['date'].min()
-    max_date = st.session_state.processed_data['date'].max()
-
-    with col1:
-        st.write("Start Date:")
-        # Provide default values only if min_date and max_date are not NaT
-        default_start_date = min_date if pd.notna(min_date) else pd.to_datetime('2020-01-01')
-        default_end_date = max_date if pd.notna(max_date) else pd.to_datetime('2024-12-31')
-
-        start_date_filter = st.date_input(
-            "Start Date",
-            value=default_start_date,
-            min_value=min_date if pd.notna(min_date) else None,
-            max_value=max_date if pd.notna(max_date) else None,
-            key="start_date_filter"
-        )
-    with col2:
-        st.write("End Date:")
-        end_date_filter = st.date_input(
-            "End Date",
-            value=default_end_date,
-            min_value=min_date if pd.notna(min_date) else None,
-            max_value=max_date if pd.notna(max_date) else None,
-            key="end_date_filter"
-        )
+    min_date, max_date = filter_options['date']
+
+    # The filter widgets are grouped in a form, so changing several selections reruns the app once, on submit
+    with st.form("filters_form", border=False):
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.write("Start Date:")
+            # Provide default values only if min_date and max_date are not NaT
+            default_start_date = min_date if pd.notna(min_date) else pd.to_datetime('2020-01-01')
+            default_end_date = max_date if pd.notna(max_date) else pd.to_datetime('2024-12-31')
+
+            start_date_filter = st.date_input(
+                "Start Date",
+                value=default_start_date,
+                min_value=min_date if pd.notna(min_date) else None,
+                max_value=max_date if pd.notna(max_date) else None,
+                key="start_date_filter"
+            )
+        with col2:
+            st.write("End Date:")
+            end_date_filter = st.date_input(
+                "End Date",
+                value=default_end_date,
+                min_value=min_date if pd.notna(min_date) else None,
+                max_value=max_date if pd.notna(max_date) else None,
+                key="end_date_filter"
+            )
+
+        col1_select, col2_select, col3_select, col4_select = st.columns(4)
+
+        with col1_select:
+            selected_platform = st.selectbox("Platform:", filter_options['platform'], key="platform_select")
+        with col2_select:
+            selected_sentiment = st.selectbox("Sentiment:", filter_options['sentiment'], key="sentiment_select")
+        with col3_select:
+            selected_location = st.selectbox("Location:", filter_options['location'], key="location_select")
+        with col4_select:
+            selected_media_type = st.selectbox("Media Type:", filter_options['media_type'], key="media_type_select")
+
+        st.form_submit_button("Apply Filters", help="Apply the selected date range and filters")
 
     # Convert date_input to pandas datetime for filtering
     if start_date_filter:
@@ -592,56 +1067,34 @@ if not st.session_state.processed_data.empty:
     if end_date_filter:
         end_date_filter = pd.to_datetime(end_date_filter)
 
-    # Filter options for selectboxes
-    platform_options = ['All'] + sorted(st.session_state.processed_data['platform'].unique().tolist())
-    sentiment_options = ['All'] + sorted(st.session_state.processed_data['sentiment'].unique().tolist())
-    location_options = ['All'] + sorted(st.session_state.processed_data['location'].unique().tolist())
-    media_type_options = ['All'] + sorted(st.session_state.processed_data['media_type'].unique().tolist())
-
-    col1_select, col2_select, col3_select, col4_select = st.columns(4)
-
-    with col1_select:
-        selected_platform = st.selectbox("Platform:", platform_options, key="platform_select")
-    with col2_select:
-        selected_sentiment = st.selectbox("Sentiment:", sentiment_options, key="sentiment_select")
-    with col3_select:
-        selected_location = st.selectbox("Location:", location_options, key="location_select")
-    with col4_select:
-        selected_media_type = st.selectbox("Media Type:", media_type_options, key="media_type_select")
-
-    # Apply filters
-    filtered_df = st.session_state.processed_data.copy()
-
-    if start_date_filter and end_date_filter:
-        filtered_df = filtered_df[
-            (filtered_df['date'] >= start_date_filter) &
-            (filtered_df['date'] <= end_date_filter)
-        ]
-    elif start_date_filter:
-        filtered_df = filtered_df[filtered_df['date'] >= start_date_filter]
-    elif end_date_filter:
-        filtered_df = filtered_df[filtered_df['date'] <= end_date_filter]
-
-    if selected_platform != 'All':
-        filtered_df = filtered_df[filtered_df['platform'] == selected_platform]
-    if selected_sentiment != 'All':
-        filtered_df = filtered_df[filtered_df['sentiment'] == selected_sentiment]
-    if selected_location != 'All':
-        filtered_df = filtered_df[filtered_df['location'] == selected_location]
-    if selected_media_type != 'All':
-        filtered_df = filtered_df[filtered_df['media_type'] == selected_media_type]
+    # Apply filters (cached, so reruns with the same selections reuse the filtered data)
+    filtered_df = apply_filters(
+        st.session_state.get('last_uploaded_digest'),
+        st.session_state.processed_data,
+        start_date_filter,
+        end_date_filter,
+        selected_platform,
+        selected_sentiment,
+        selected_location,
+        selected_media_type
+    )
 
     st.session_state.filtered_data = filtered_df
+    # Cheap fingerprint of the filtered data (upload digest + filter selections). The st.cache_data functions
+    # derived from the filtered data (aggregates, figures, insights, built-in analysis) take it as their cache key
+    # and receive the data itself as an underscore (unhashed) argument, so Streamlit never hashes the DataFrame.
+    # Likewise, parsing and the filter options are cached on the upload's content digest, and filtering on the digest plus the filter values.
+    st.session_state.filtered_data_key = (
+        st.session_state.get('last_uploaded_digest'),
+        start_date_filter,
+        end_date_filter,
+        selected_platform,
+        selected_sentiment,
+        selected_location,
+        selected_media_type
+    )
 
-    if st.button("Reset Filters", key="reset_filters_btn", help="Clear all filter selections"):
-        st.session_state.processed_data = parse_csv_and_clean_data(uploaded_file) # Re-process original to reset
-        st.session_state.filtered_data = st.session_state.processed_data.copy()
-        # Reset selectbox values, date inputs need to be explicitly set or refreshed
-        st.session_state.platform_select = 'All'
-        st.session_state.sentiment_select = 'All'
-        st.session_state.location_select = 'All'
-        st.session_state.media_type_select = 'All'
-        st.experimental_rerun() # Rerun to update date inputs and selectboxes
+    st.button("Reset Filters", key="reset_filters_btn", help="Clear all filter selections", on_click=reset_filters)
 
     st.markdown(f"<p class='mt-4 text-blue-600 font-medium'>Showing {len(st.session_state.filtered_data)} records after applying filters.</p>", unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
@@ -653,117 +1106,7 @@ st.markdown("<h2 class='section-header'>3. Interactive Charts & 4. Top 3 Insight
 if st.session_state.filtered_data.empty:
     st.info("Upload a CSV file and apply filters to see the interactive charts and their insights.")
 else:
-    # Chart 1: Sentiment Breakdown
-    st.markdown("### Sentiment Breakdown")
-    sentiment_data = st.session_state.filtered_data['sentiment'].value_counts().reset_index()
-    sentiment_data.columns = ['Sentiment', 'Count']
-    fig1 = px.pie(
-        sentiment_data,
-        values='Count',
-        names='Sentiment',
-        title='Sentiment Breakdown',
-        hole=0.4,
-        color='Sentiment',
-        color_discrete_map={
-            'Positive': CHART_COLORS['sentiment'][0],
-            'Neutral': CHART_COLORS['sentiment'][1],
-            'Negative': CHART_COLORS['sentiment'][2]
-        }
-    )
-    fig1.update_traces(textinfo='percent+label', marker=dict(line=dict(color='#000', width=1)))
-    fig1.update_layout(font_family="Montserrat", title_x=0.5, margin=dict(l=20, r=20, t=50, b=20))
-    st.plotly_chart(fig1, use_container_width=True)
-    st.markdown("<div class='mt-4 p-4 bg-gray-50 rounded-md border border-gray-200'>", unsafe_allow_html=True)
-    st.markdown("<h4 class='text-lg font-medium text-gray-700 mb-2'>Top 3 Insights:</h4>", unsafe_allow_html=True)
-    for insight in get_insights('Sentiment Breakdown', st.session_state.filtered_data):
-        st.markdown(f"<p class='text-gray-600'>{insight}</p>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-    # Chart 2: Engagement Trend over time
-    st.markdown("### Engagement Trend over time")
-    engagements_by_date = st.session_state.filtered_data.groupby(st.session_state.filtered_data['date'].dt.date)['engagements'].sum().reset_index()
-    engagements_by_date.columns = ['Date', 'Total Engagements']
-    fig2 = px.line(
-        engagements_by_date,
-        x='Date',
-        y='Total Engagements',
-        title='Engagement Trend over time',
-        markers=True,
-        line_shape='spline',
-        color_discrete_sequence=[CHART_COLORS['primary']]
-    )
-    fig2.update_layout(font_family="Montserrat", title_x=0.5, margin=dict(l=20, r=20, t=50, b=20))
-    st.plotly_chart(fig2, use_container_width=True)
-    st.markdown("<div class='mt-4 p-4 bg-gray-50 rounded-md border border-gray-200'>", unsafe_allow_html=True)
-    st.markdown("<h4 class='text-lg font-medium text-gray-700 mb-2'>Top 3 Insights:</h4>", unsafe_allow_html=True)
-    for insight in get_insights('Engagement Trend over time', st.session_state.filtered_data):
-        st.markdown(f"<p class='text-gray-600'>{insight}</p>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-    # Chart 3: Platform Engagements
-    st.markdown("### Platform Engagements")
-    platform_engagements = st.session_state.filtered_data.groupby('platform')['engagements'].sum().reset_index()
-    platform_engagements.columns = ['Platform', 'Total Engagements']
-    platform_engagements = platform_engagements.sort_values('Total Engagements', ascending=False)
-    fig3 = px.bar(
-        platform_engagements,
-        x='Platform',
-        y='Total Engagements',
-        title='Platform Engagements',
-        color_discrete_sequence=[CHART_COLORS['secondary']]
-    )
-    fig3.update_layout(font_family="Montserrat", title_x=0.5, margin=dict(l=20, r=20, t=50, b=20))
-    st.plotly_chart(fig3, use_container_width=True)
-    st.markdown("<div class='mt-4 p-4 bg-gray-50 rounded-md border border-gray-200'>", unsafe_allow_html=True)
-    st.markdown("<h4 class='text-lg font-medium text-gray-700 mb-2'>Top 3 Insights:</h4>", unsafe_allow_html=True)
-    for insight in get_insights('Platform Engagements', st.session_state.filtered_data):
-        st.markdown(f"<p class='text-gray-600'>{insight}</p>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-    # Chart 4: Media Type Mix
-    st.markdown("### Media Type Mix")
-    media_type_data = st.session_state.filtered_data['media_type'].value_counts().reset_index()
-    media_type_data.columns = ['Media Type', 'Count']
-    fig4 = px.pie(
-        media_type_data,
-        values='Count',
-        names='Media Type',
-        title='Media Type Mix',
-        hole=0.4,
-        color='Media Type',
-        color_discrete_sequence=CHART_COLORS['media_type']
-    )
-    fig4.update_traces(textinfo='percent+label', marker=dict(line=dict(color='#000', width=1)))
-    fig4.update_layout(font_family="Montserrat", title_x=0.5, margin=dict(l=20, r=20, t=50, b=20))
-    st.plotly_chart(fig4, use_container_width=True)
-    st.markdown("<div class='mt-4 p-4 bg-gray-50 rounded-md border border-gray-200'>", unsafe_allow_html=True)
-    st.markdown("<h4 class='text-lg font-medium text-gray-700 mb-2'>Top 3 Insights:</h4>", unsafe_allow_html=True)
-    for insight in get_insights('Media Type Mix', st.session_state.filtered_data):
-        st.markdown(f"<p class='text-gray-600'>{insight}</p>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-    # Chart 5: Top 5 Locations
-    st.markdown("### Top 5 Locations by Engagement")
-    location_engagements = st.session_state.filtered_data.groupby('location')['engagements'].sum().nlargest(5).reset_index()
-    location_engagements.columns = ['Location', 'Total Engagements']
-    fig5 = px.bar(
-        location_engagements,
-        x='Location',
-        y='Total Engagements',
-        title='Top 5 Locations by Engagement',
-        color_discrete_sequence=[CHART_COLORS['tertiary']]
-    )
-    fig5.update_layout(font_family="Montserrat", title_x=0.5, margin=dict(l=20, r=20, t=50, b=20))
-    st.plotly_chart(fig5, use_container_width=True)
-    st.markdown("<div class='mt-4 p-4 bg-gray-50 rounded-md border border-gray-200'>", unsafe_allow_html=True)
-    st.markdown("<h4 class='text-lg font-medium text-gray-700 mb-2'>Top 3 Insights:</h4>", unsafe_allow_html=True)
-    for insight in get_insights('Top 5 Locations', st.session_state.filtered_data):
-        st.markdown(f"<p class='text-gray-600'>{insight}</p>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
+    render_charts(st.session_state.filtered_data, st.session_state.get('filtered_data_key'))
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -777,7 +1120,10 @@ if not st.session_state.filtered_data.empty:
     with col_btn1:
         if st.button("Analysis from Us", key="our_model_analysis_btn", help="Generate summary and recommendations from our built-in model.",
                      use_container_width=True, type="secondary" if st.session_state.current_analysis_source != 'our_model' else "primary"):
-            summary, recommendations = generate_our_model_analysis(st.session_state.filtered_data)
+            filtered_data_key = st.session_state.get('filtered_data_key')
+            summary, recommendations = generate_our_model_analysis(
+                filtered_data_key, compute_aggregates(filtered_data_key, st.session_state.filtered_data)
+            )
             st.session_state.our_model_summary = summary
             st.session_state.our_model_recommendations = recommendations
             st.session_state.current_analysis_source = 'our_model'
@@ -791,7 +1137,8 @@ if not st.session_state.filtered_data.empty:
                 summary, recommendations, err = generate_openrouter_analysis(
                     st.session_state.filtered_data,
                     st.session_state.openrouter_api_key,
-                    st.session_state.openrouter_selected_model
+                    st.session_state.openrouter_selected_model,
+                    stream_placeholder=st.empty()
                 )
                 st.session_state.ai_generated_summary = summary
                 st.session_state.ai_generated_recommendations = recommendations
@@ -807,51 +1154,42 @@ if not st.session_state.filtered_data.empty:
 
     st.markdown("<div class='p-4 bg-gray-50 rounded-md border border-gray-200 mb-6'>", unsafe_allow_html=True)
     st.markdown("<h3 class='text-lg font-semibold text-gray-700 mb-3'>OpenRouter AI Configuration</h3>", unsafe_allow_html=True)
-    st.session_state.openrouter_api_key = st.text_input(
-        "OpenRouter API Key:",
-        type="password",
-        value=st.session_state.openrouter_api_key,
-        placeholder="sk-or-...",
-        help="Get your key from https://openrouter.ai/keys",
-        key="openrouter_api_key_input"
-    )
-    st.session_state.openrouter_selected_model = st.selectbox(
-        "Select AI Model:",
-        options=openRouterModels,
-        index=openRouterModels.index(st.session_state.openrouter_selected_model) if st.session_state.openrouter_selected_model in openRouterModels else 0,
-        key="openrouter_model_select"
-    )
+    render_openrouter_config()
     if st.session_state.get('openrouter_analysis_error'):
         st.markdown(f"<p class='mt-4 text-red-600 font-medium'>{st.session_state.openrouter_analysis_error}</p>", unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
     # Display Analysis
     if st.session_state.current_analysis_source == 'our_model':
-        st.markdown("<h3 class='text-xl font-semibold text-gray-700 mb-2'>Overall Summary (Our Model):</h3>", unsafe_allow_html=True)
-        st.markdown(f"<p class='text-gray-600 leading-relaxed'>{st.session_state.our_model_summary}</p>", unsafe_allow_html=True)
-        st.markdown("<h3 class='text-xl font-semibold text-gray-700 mb-2 mt-4'>Campaign Recommendations (Our Model):</h3>", unsafe_allow_html=True)
-        st.markdown("<ul class='list-disc list-inside text-gray-600 space-y-2'>", unsafe_allow_html=True)
+        # Summary and recommendations are sent to the page as one HTML block
         if st.session_state.our_model_recommendations:
-            for rec in st.session_state.our_model_recommendations:
-                st.markdown(f"<li>{rec}</li>", unsafe_allow_html=True)
+            recommendation_items = "".join(f"<li>{rec}</li>" for rec in st.session_state.our_model_recommendations)
         else:
-            st.markdown("<li>No specific recommendations could be generated with the current data. Try uploading more data or adjusting filters.</li>", unsafe_allow_html=True)
-        st.markdown("</ul>", unsafe_allow_html=True)
+            recommendation_items = "<li>No specific recommendations could be generated with the current data. Try uploading more data or adjusting filters.</li>"
+        st.markdown(
+            "<h3 class='text-xl font-semibold text-gray-700 mb-2'>Overall Summary (Our Model):</h3>"
+            f"<p class='text-gray-600 leading-relaxed'>{st.session_state.our_model_summary}</p>"
+            "<h3 class='text-xl font-semibold text-gray-700 mb-2 mt-4'>Campaign Recommendations (Our Model):</h3>"
+            f"<ul class='list-disc list-inside text-gray-600 space-y-2'>{recommendation_items}</ul>",
+            unsafe_allow_html=True
+        )
     elif st.session_state.current_analysis_source == 'openrouter_ai':
-        st.markdown("<h3 class='text-xl font-semibold text-gray-700 mb-2'>Overall Summary (OpenRouter AI):</h3>", unsafe_allow_html=True)
+        # Summary and recommendations are sent to the page as one HTML block
         if st.session_state.ai_generated_summary:
-            st.markdown(f"<p class='text-gray-600 leading-relaxed'>{st.session_state.ai_generated_summary}</p>", unsafe_allow_html=True)
+            summary_text = st.session_state.ai_generated_summary
         else:
-            st.markdown("<p class='text-gray-600 leading-relaxed'>Click 'Analysis from OpenRouter AI' to get insights.</p>", unsafe_allow_html=True)
-
-        st.markdown("<h3 class='text-xl font-semibold text-gray-700 mb-2 mt-4'>Campaign Recommendations (OpenRouter AI):</h3>", unsafe_allow_html=True)
-        st.markdown("<ul class='list-disc list-inside text-gray-600 space-y-2'>", unsafe_allow_html=True)
+            summary_text = "Click 'Analysis from OpenRouter AI' to get insights."
         if st.session_state.ai_generated_recommendations:
-            for rec in st.session_state.ai_generated_recommendations:
-                st.markdown(f"<li>{rec}</li>", unsafe_allow_html=True)
+            recommendation_items = "".join(f"<li>{rec}</li>" for rec in st.session_state.ai_generated_recommendations)
         else:
-            st.markdown("<li>No specific recommendations were generated by the AI, or there was an error.</li>", unsafe_allow_html=True)
-        st.markdown("</ul>", unsafe_allow_html=True)
+            recommendation_items = "<li>No specific recommendations were generated by the AI, or there was an error.</li>"
+        st.markdown(
+            "<h3 class='text-xl font-semibold text-gray-700 mb-2'>Overall Summary (OpenRouter AI):</h3>"
+            f"<p class='text-gray-600 leading-relaxed'>{summary_text}</p>"
+            "<h3 class='text-xl font-semibold text-gray-700 mb-2 mt-4'>Campaign Recommendations (OpenRouter AI):</h3>"
+            f"<ul class='list-disc list-inside text-gray-600 space-y-2'>{recommendation_items}</ul>",
+            unsafe_allow_html=True
+        )
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -875,7 +1213,7 @@ if not st.session_state.processed_data.empty:
             current_summary = st.session_state.ai_generated_summary
             current_recommendations = st.session_state.ai_generated_recommendations
 
-        pdf_buffer = create_pdf_report(current_summary, current_recommendations)
+        pdf_buffer = build_pdf_report(current_summary, tuple(current_recommendations))
 
         if pdf_buffer:
             st.download_button(